@@ -1,9 +1,12 @@
 import sys
 import os
 import csv
+import pickle
 import getpass
+import queue
 import time
 import subprocess
+from typing import NamedTuple
 
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -42,15 +45,16 @@ def pick_storage_base():
         if not os.path.isdir(root):
             continue
         try:
-            for name in os.listdir(root):
-                mount_path = os.path.join(root, name)
-                if os.path.isdir(mount_path) and os.access(mount_path, os.W_OK):
-                    base = os.path.join(mount_path, "signin_kiosk_data")
-                    try:
-                        os.makedirs(base, exist_ok=True)
-                        return base
-                    except Exception:
-                        pass
+            with os.scandir(root) as it:
+                for entry in it:
+                    # DirEntry already knows its type, no extra stat per mount.
+                    if entry.is_dir() and os.access(entry.path, os.W_OK):
+                        base = os.path.join(entry.path, "signin_kiosk_data")
+                        try:
+                            os.makedirs(base, exist_ok=True)
+                            return base
+                        except Exception:
+                            pass
         except Exception:
             pass
 
@@ -60,10 +64,14 @@ def pick_storage_base():
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 MASTER_CSV = os.path.join(SCRIPT_DIR, "students_master.csv")
+MASTER_CACHE = MASTER_CSV + ".cache.pkl"
+MASTER_CACHE_VERSION = 2  # bump when the cached roster shape changes
 BASE_DATA_DIR = pick_storage_base()
 EXIT_CODE = "exit"
 VENV_PYTHON = "/home/gnomeskillet/kiosk-env/bin/python"
 UPLOAD_SCRIPT = "/home/gnomeskillet/signin_kiosk/upload_kiosk_day.py"
+UPLOAD_LOG_MAX_LINES = 500
+CAPTURE_STOP_TIMEOUT_MS = 3000
 KIOSK_TZ = ZoneInfo("America/Chicago")
 
 
@@ -113,21 +121,92 @@ def normalize_login(value: str) -> str:
         value = value.split("@", 1)[0]
     return value
 
-def load_students(master_csv):
+class Student(NamedTuple):
+    """One roster row from students_master.csv (fields already stripped)."""
+    student_id: str
+    full_name: str
+    grade: str
+    email: str
+
+def load_students_cache(cache_path, st):
+    """
+    Return the cached (by_id, by_username) pair if it was written for the
+    current mtime/size of the master CSV, else None.
+    """
+    try:
+        with open(cache_path, "rb") as f:
+            version, mtime, size, by_id, by_username = pickle.load(f)
+    except Exception:
+        # Missing, truncated, or from an older format -> just re-parse.
+        return None
+
+    if version != MASTER_CACHE_VERSION or mtime != st.st_mtime or size != st.st_size:
+        return None
+    return by_id, by_username
+
+def save_students_cache(cache_path, st, by_id, by_username):
+    try:
+        with open(cache_path, "wb") as f:
+            pickle.dump(
+                (MASTER_CACHE_VERSION, st.st_mtime, st.st_size, by_id, by_username),
+                f,
+                protocol=5,
+            )
+    except Exception:
+        # Cache is only an optimization; a read-only SD card shouldn't stop the kiosk.
+        pass
+
+def load_students(master_csv, cache_path=None):
+    st = os.stat(master_csv)
+    if cache_path:
+        cached = load_students_cache(cache_path, st)
+        if cached is not None:
+            return cached
+
     by_id = {}
     by_username = {}
 
     with open(master_csv, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        # Skip blank lines some spreadsheet exports put above the header.
+        headers = [h.strip() for h in next((r for r in reader if r), [])]
+        if not headers:
+            # Empty roster file: start with nobody rather than refusing to boot.
+            return by_id, by_username
+
+        # Resolve column positions once instead of building a dict per row.
+        # Student ID is required; the rest may be missing from older exports.
+        if "Student ID" not in headers:
+            raise ValueError('missing "Student ID" column')
+        i_id = headers.index("Student ID")
+        i_name = headers.index("Full Name") if "Full Name" in headers else None
+        i_grade = headers.index("Grade") if "Grade" in headers else None
+        i_email = headers.index("Email Address") if "Email Address" in headers else None
+
+        def cell(row, i):
+            if i is None or i >= len(row):
+                return ""
+            return row[i].strip()
+
         for row in reader:
-            sid = row["Student ID"].strip()
-            email = row.get("Email Address", "").strip()
+            if not row:
+                continue
+
+            student = Student(
+                student_id=cell(row, i_id),
+                full_name=cell(row, i_name),
+                grade=cell(row, i_grade),
+                email=cell(row, i_email),
+            )
+
+            by_id[student.student_id] = student
 
-            by_id[sid] = row
+            if student.email:
+                username = normalize_login(student.email)
+                by_username[username] = student
 
-            if email:
-                username = normalize_login(email)
-                by_username[username] = row
+    if cache_path:
+        save_students_cache(cache_path, st, by_id, by_username)
 
     return by_id, by_username
 
@@ -286,6 +365,9 @@ class UploadProgressDialog(QDialog):
         self.log.setReadOnly(True)
         self.log.setStyleSheet("font-size: 14px;")
         self.log.setMinimumHeight(320)
+        # QPlainTextEdit only paints visible lines, but it still lays out and
+        # keeps every block; cap history so long uploads stay cheap to scroll.
+        self.log.setMaximumBlockCount(UPLOAD_LOG_MAX_LINES)
 
         layout.addWidget(self.lbl)
         layout.addWidget(self.log)
@@ -293,30 +375,64 @@ class UploadProgressDialog(QDialog):
         self.resize(720, 420)
         self.setMaximumHeight(440)
 
+        # tqdm redraws arrive as many tiny lines; collect them and append in
+        # one go so the log repaints a few times a second instead of per line.
+        self._pending_lines = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(100)
+        self._flush_timer.timeout.connect(self.flush_lines)
 
     def append_line(self, line: str):
-        self.log.appendPlainText(line.rstrip())
+        self._pending_lines.append(line.rstrip())
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush_lines(self):
+        self._flush_timer.stop()
+        if not self._pending_lines:
+            return
+
+        self.log.appendPlainText("\n".join(self._pending_lines))
+        self._pending_lines.clear()
         # Auto-scroll to bottom
         sb = self.log.verticalScrollBar()
         sb.setValue(sb.maximum())
 
 class CaptureWorker(QThread):
+    """
+    One long-lived camera thread for the whole session.
+    capture() queues a photo path; results come back via done/failed.
+    """
     done = pyqtSignal(str)    # photo_filename
     failed = pyqtSignal(str)  # error msg
 
-    def __init__(self, picam2, still_config, photo_path):
+    def __init__(self, picam2, still_config):
         super().__init__()
         self.picam2 = picam2
         self.still_config = still_config
-        self.photo_path = photo_path
+        self._requests = queue.Queue()
+
+    def capture(self, photo_path):
+        self._requests.put(photo_path)
+
+    def stop(self, timeout_ms=CAPTURE_STOP_TIMEOUT_MS):
+        # Bounded so a hung libcamera capture can't keep the kiosk from exiting.
+        self._requests.put(None)
+        return self.wait(timeout_ms)
 
     def run(self):
-        try:
-            # Switch from preview mode to still mode for capture (more reliable)
-            self.picam2.switch_mode_and_capture_file(self.still_config, self.photo_path)
-            self.done.emit(os.path.basename(self.photo_path))
-        except Exception as e:
-            self.failed.emit(str(e))
+        while True:
+            photo_path = self._requests.get()
+            if photo_path is None:
+                return
+
+            try:
+                # Switch from preview mode to still mode for capture (more reliable)
+                self.picam2.switch_mode_and_capture_file(self.still_config, photo_path)
+                self.done.emit(os.path.basename(photo_path))
+            except Exception as e:
+                self.failed.emit(str(e))
 
 class KioskWindow(QWidget):
     def __init__(self):
@@ -325,10 +441,13 @@ class KioskWindow(QWidget):
         ensure_dirs()
 
         try:
-            self.students_by_id, self.students_by_username = load_students(MASTER_CSV)
+            self.students_by_id, self.students_by_username = load_students(MASTER_CSV, MASTER_CACHE)
         except FileNotFoundError:
             QMessageBox.critical(self, "Error", f"{MASTER_CSV} not found.")
             sys.exit(1)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", f"{MASTER_CSV}: {e}.")
+            sys.exit(1)
 
         self.current_day_str = None
         self.signins_path = None
@@ -356,6 +475,7 @@ class KioskWindow(QWidget):
         self.picam2.configure(self.preview_config)
 
         # Build UI first so widget sizes exist
+        self.capture_busy = False
         self.capture_worker = None
         self.pending_student = None
         self.build_ui()
@@ -387,6 +507,13 @@ class KioskWindow(QWidget):
         # Apply crop after the window is shown (sizes settle)
         self.apply_preview_crop()
 
+        # Single capture thread, reused for every sign-in. Started last so a
+        # failed camera/UI setup above never leaves an orphaned thread behind.
+        self.capture_worker = CaptureWorker(self.picam2, self.still_config)
+        self.capture_worker.done.connect(self.on_capture_done)
+        self.capture_worker.failed.connect(self.on_capture_failed)
+        self.capture_worker.start()
+
     def build_ui(self):
         self.setWindowTitle("Sign-In Kiosk")
 
@@ -552,7 +679,7 @@ class KioskWindow(QWidget):
         if hasattr(self, "_status_reset_timer"):
             self._status_reset_timer.stop()
 
-        if self.capture_worker and self.capture_worker.isRunning():
+        if self.capture_busy:
             return
 
         raw_input = self.id_input.text()
@@ -579,17 +706,14 @@ class KioskWindow(QWidget):
 
         # --- Lookup student by numeric ID OR username/email ---
         student = None
-        student_id = None
 
         # 1) Numeric student ID
-        if login.isdigit() and login in self.students_by_id:
-            student = self.students_by_id[login]
-            student_id = login
+        if login.isdigit():
+            student = self.students_by_id.get(login)
 
         # 2) Chromebook barcode username OR full email
-        elif login in self.students_by_username:
-            student = self.students_by_username[login]
-            student_id = student["Student ID"].strip()
+        if student is None:
+            student = self.students_by_username.get(login)
 
         if not student:
             self.set_status("ID or email not found. Please try again.", "#cc0000")
@@ -597,18 +721,20 @@ class KioskWindow(QWidget):
             self.id_input.clear()
             return
 
+        student_id = student.student_id
+
         # Duplicate sign-in check (always use resolved numeric ID)
         if student_id in self.signed_in_ids:
-            full_name = student.get("Full Name", "").strip()
+            full_name = student.full_name
             self.set_status(f"{full_name} is already signed in.", "#cc0000")
             self._status_reset_timer.start(4000)
             self.id_input.clear()
             return
 
         # --- From here down, your original flow stays the same ---
-        full_name = student.get("Full Name", "").strip()
-        grade = str(student.get("Grade", "")).strip()
-        email = student.get("Email Address", "").strip()
+        full_name = student.full_name
+        grade = student.grade
+        email = student.email
 
         # Expecting "Last, First" OR "First Last"
         if "," in full_name:
@@ -666,6 +792,7 @@ class KioskWindow(QWidget):
     def on_upload_ok(self, output: str):
         try:
             if self.upload_dialog:
+                self.upload_dialog.flush_lines()
                 self.upload_dialog.lbl.setText("✅ Upload complete.")
         except Exception:
             pass
@@ -681,6 +808,7 @@ class KioskWindow(QWidget):
     def on_upload_err(self, output: str):
         try:
             if self.upload_dialog:
+                self.upload_dialog.flush_lines()
                 self.upload_dialog.lbl.setText("❌ Upload failed. See log.")
         except Exception:
             pass
@@ -693,6 +821,7 @@ class KioskWindow(QWidget):
         self.id_input.setFocus()
 
     def on_capture_done(self, _photo_filename):
+        self.capture_busy = False
         try:
             with open(self.signins_path, "a", newline="", encoding="utf-8") as f:
                 writer = csv.writer(f)
@@ -714,6 +843,7 @@ class KioskWindow(QWidget):
         self.sign_in_btn.setEnabled(True)
 
     def on_capture_failed(self, msg):
+        self.capture_busy = False
         self.set_status(f"Camera error: {msg}", "#cc0000")
         self._status_reset_timer.start(5000)
         self.pending_student = None
@@ -721,8 +851,17 @@ class KioskWindow(QWidget):
         self.id_input.setFocus()
 
     def closeEvent(self, event):
+        # Give an in-flight capture a few seconds to finish before the camera goes away.
+        if self.capture_worker:
+            try:
+                self.capture_worker.stop()
+            except Exception:
+                pass
+
+        # The camera stays configured for the life of the kiosk; release it once here.
         try:
             self.picam2.stop()
+            self.picam2.close()
         except Exception:
             pass
         super().closeEvent(event)
@@ -752,14 +891,8 @@ class KioskWindow(QWidget):
         self.set_status("Taking photo…", "#0000aa")
         self.sign_in_btn.setEnabled(False)
 
-        self.capture_worker = CaptureWorker(
-            self.picam2,
-            self.still_config,
-            self.photo_path
-        )
-        self.capture_worker.done.connect(self.on_capture_done)
-        self.capture_worker.failed.connect(self.on_capture_failed)
-        self.capture_worker.start()
+        self.capture_busy = True
+        self.capture_worker.capture(self.photo_path)
 
     def show_idle_status(self):
         if not self.clock_ready:
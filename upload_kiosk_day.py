@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 import sys
-import mimetypes
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from pathlib import Path
 import os
 import getpass
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
 from tqdm import tqdm
 
@@ -34,15 +38,16 @@ def pick_storage_base():
         if not os.path.isdir(root):
             continue
         try:
-            for name in os.listdir(root):
-                mount_path = os.path.join(root, name)
-                if os.path.isdir(mount_path) and os.access(mount_path, os.W_OK):
-                    base = os.path.join(mount_path, "signin_kiosk_data")
-                    try:
-                        os.makedirs(base, exist_ok=True)
-                        return base
-                    except Exception:
-                        pass
+            with os.scandir(root) as it:
+                for entry in it:
+                    # DirEntry already knows its type, no extra stat per mount.
+                    if entry.is_dir() and os.access(entry.path, os.W_OK):
+                        base = os.path.join(entry.path, "signin_kiosk_data")
+                        try:
+                            os.makedirs(base, exist_ok=True)
+                            return base
+                        except Exception:
+                            pass
         except Exception:
             pass
 
@@ -65,115 +70,311 @@ LOCAL_BASE_DATA_DIR = pick_storage_base()
 
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 KIOSK_TZ = ZoneInfo("America/Chicago")
+UPLOAD_WORKERS = 6
+FOLDER_MIME = "application/vnd.google-apps.folder"
+DRIVE_BATCH_LIMIT = 100  # max calls per Drive batch HTTP request
+# Parallel writes can trip Drive's per-user rate limit; googleapiclient backs
+# off and retries 403 rate-limit, 429 and 5xx responses this many times.
+DRIVE_NUM_RETRIES = 5
+RESUMABLE_MIN_BYTES = 5 * 1024 * 1024   # smaller files go up in one request
+RESUMABLE_CHUNK_BYTES = 8 * 1024 * 1024
+
+# The kiosk only writes a few file types; no need for the system mime database.
+_MIME = {
+    ".csv": "text/csv",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".json": "application/json",
+}
 
 
 def now_local() -> datetime:
     return datetime.now(KIOSK_TZ)
 
-def find_child_by_name(service, parent_id: str, name: str):
+def drive_query_literal(value: str) -> str:
+    """Quote `value` for use inside a Drive `q=` search string."""
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+# Drive folder listings, fetched once per folder: {parent_id: {name: (id, mimeType)}}
+_listing_cache: dict[str, dict[str, tuple[str, str]]] = {}
+_listing_lock = threading.Lock()
+
+def list_children(service, parent_id: str) -> dict:
     """
-    Return (file_id, mimeType) of an item named `name` directly under `parent_id`,
-    or (None, None) if not found.
+    Return {name: (file_id, mimeType)} for everything directly under `parent_id`.
+    The folder is listed from Drive once; later calls (and our own creates)
+    use/update the cached mapping instead of querying per file.
     """
-    q = f"'{parent_id}' in parents and name='{name}' and trashed=false"
-    res = service.files().list(
-        q=q,
-        fields="files(id,name,mimeType)",
-        pageSize=10,
-        supportsAllDrives=True,
-        includeItemsFromAllDrives=True
-    ).execute()
-    files = res.get("files", [])
-    if not files:
-        return None, None
-
-    # If duplicates already exist, just use the first one.
-    # (Optional: you could later clean extras.)
-    return files[0]["id"], files[0]["mimeType"]
-
-def count_files_recursive(local_dir: Path) -> int:
-    return sum(1 for p in local_dir.rglob("*") if p.is_file())
+    with _listing_lock:
+        children = _listing_cache.get(parent_id)
+        if children is not None:
+            return children
+
+        children = {}
+        page_token = None
+        while True:
+            res = service.files().list(
+                q=f"{drive_query_literal(parent_id)} in parents and trashed=false",
+                fields="nextPageToken, files(id,name,mimeType)",
+                pageSize=1000,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            ).execute(num_retries=DRIVE_NUM_RETRIES)
+
+            for f in res.get("files", []):
+                # If duplicates already exist, just use the first one.
+                # (Optional: you could later clean extras.)
+                # A folder always wins over a file of the same name, otherwise
+                # ensure_drive_folder would create a duplicate folder every run.
+                existing = children.get(f["name"])
+                if existing is None or (
+                    f["mimeType"] == FOLDER_MIME and existing[1] != FOLDER_MIME
+                ):
+                    children[f["name"]] = (f["id"], f["mimeType"])
+
+            page_token = res.get("nextPageToken")
+            if not page_token:
+                break
+
+        _listing_cache[parent_id] = children
+        return children
+
+def remember_child(parent_id: str, name: str, file_id: str, mime: str):
+    """Record an item we just created so later lookups don't need Drive."""
+    with _listing_lock:
+        _listing_cache.setdefault(parent_id, {})[name] = (file_id, mime)
+        if mime == FOLDER_MIME:
+            # A folder we just created has no children yet.
+            _listing_cache.setdefault(file_id, {})
+
+_credentials = None
+_credentials_lock = threading.Lock()
+
+def get_drive_credentials():
+    """Load the service account once; every client shares it (and its token)."""
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials = service_account.Credentials.from_service_account_file(
+                SERVICE_ACCOUNT_JSON, scopes=SCOPES
+            )
+        return _credentials
 
 def get_drive_service():
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_JSON, scopes=SCOPES
-    )
-    return build("drive", "v3", credentials=creds)
+    """
+    Build a Drive client using the shared credentials. Each client still
+    gets its own HTTP transport, which is why upload workers build their own.
+    """
+    return build("drive", "v3", credentials=get_drive_credentials())
+
+_thread_state = threading.local()
+
+def get_thread_drive_service():
+    """
+    Return a Drive service owned by the calling thread.
+    The client's underlying httplib2.Http is not thread-safe, so upload
+    workers must not share the main thread's service object.
+    """
+    service = getattr(_thread_state, "service", None)
+    if service is None:
+        service = get_drive_service()
+        _thread_state.service = service
+    return service
 
 
 def ensure_drive_folder(service, name: str, parent_id: str) -> str:
     """Find or create a folder named `name` under `parent_id` and return its ID."""
-    q = (
-        "mimeType='application/vnd.google-apps.folder' and "
-        f"name='{name}' and '{parent_id}' in parents and trashed=false"
-    )
-    res = service.files().list(
-        q=q,
-        fields="files(id,name)",
-        pageSize=10,
-        supportsAllDrives=True,
-        includeItemsFromAllDrives=True
-    ).execute()
-
-    files = res.get("files", [])
-    if files:
-        return files[0]["id"]
+    existing_id, mime = list_children(service, parent_id).get(name, (None, None))
+    if existing_id and mime == FOLDER_MIME:
+        return existing_id
 
     meta = {
         "name": name,
-        "mimeType": "application/vnd.google-apps.folder",
+        "mimeType": FOLDER_MIME,
         "parents": [parent_id],
     }
     created = service.files().create(
         body=meta,
         fields="id",
         supportsAllDrives=True
-    ).execute()
+    ).execute(num_retries=DRIVE_NUM_RETRIES)
 
+    remember_child(parent_id, name, created["id"], FOLDER_MIME)
     return created["id"]
 
+def is_retryable_drive_error(exc) -> bool:
+    """
+    Same cases googleapiclient retries for num_retries: 429, 5xx, and 403
+    rate-limit responses. Batch sub-requests don't get that retry for free.
+    """
+    if not isinstance(exc, HttpError):
+        return False
+    status = exc.resp.status
+    if status == 429 or status >= 500:
+        return True
+    return status == 403 and b"ratelimitexceeded" in (exc.content or b"").lower()
+
+def ensure_drive_folders(service, folders: list) -> list:
+    """
+    Like ensure_drive_folder, for a list of (name, parent_id) pairs.
+    Returns the folder IDs in the same order. Missing folders are created
+    through Drive's batch endpoint, up to DRIVE_BATCH_LIMIT per HTTP request.
+    """
+    ids = [None] * len(folders)
+    missing = []
+    for i, (name, parent_id) in enumerate(folders):
+        existing_id, mime = list_children(service, parent_id).get(name, (None, None))
+        if existing_id and mime == FOLDER_MIME:
+            ids[i] = existing_id
+        else:
+            missing.append(i)
+
+    failed = {}
+
+    def on_created(request_id, response, exception):
+        i = int(request_id)
+        if exception is not None:
+            failed[i] = exception
+            return
+        name, parent_id = folders[i]
+        ids[i] = response["id"]
+        remember_child(parent_id, name, response["id"], FOLDER_MIME)
+
+    for start in range(0, len(missing), DRIVE_BATCH_LIMIT):
+        pending = missing[start:start + DRIVE_BATCH_LIMIT]
+
+        # BatchHttpRequest.execute() has no num_retries, so re-send throttled
+        # sub-requests ourselves with the same randomized exponential backoff.
+        for attempt in range(DRIVE_NUM_RETRIES + 1):
+            if attempt:
+                time.sleep(random.random() * 2 ** attempt)
+
+            failed.clear()
+            batch = service.new_batch_http_request(callback=on_created)
+            for i in pending:
+                name, parent_id = folders[i]
+                meta = {
+                    "name": name,
+                    "mimeType": FOLDER_MIME,
+                    "parents": [parent_id],
+                }
+                batch.add(
+                    service.files().create(body=meta, fields="id", supportsAllDrives=True),
+                    request_id=str(i),
+                )
+
+            try:
+                batch.execute()
+            except HttpError as e:
+                if attempt == DRIVE_NUM_RETRIES or not is_retryable_drive_error(e):
+                    raise
+                continue
+
+            if not failed:
+                break
+
+            fatal = [e for e in failed.values() if not is_retryable_drive_error(e)]
+            if fatal:
+                raise fatal[0]
+            if attempt == DRIVE_NUM_RETRIES:
+                raise next(iter(failed.values()))
+            pending = sorted(failed)
+
+    return ids
+
+
+def make_media(local_path: Path, mime: str) -> MediaFileUpload:
+    """
+    Small files (CSV, photos) go up as a single multipart request; a
+    resumable session only pays off for large files, and then in big chunks.
+    """
+    if local_path.stat().st_size < RESUMABLE_MIN_BYTES:
+        return MediaFileUpload(str(local_path), mimetype=mime, resumable=False)
+    return MediaFileUpload(
+        str(local_path), mimetype=mime, resumable=True, chunksize=RESUMABLE_CHUNK_BYTES
+    )
 
 def upload_file(service, local_path: Path, parent_id: str, overwrite: bool = False):
-    mime, _ = mimetypes.guess_type(str(local_path))
-    if not mime:
-        mime = "application/octet-stream"
+    mime = _MIME.get(local_path.suffix.lower(), "application/octet-stream")
 
-    existing_id, _ = find_child_by_name(service, parent_id, local_path.name)
+    existing_id, _ = list_children(service, parent_id).get(local_path.name, (None, None))
 
-    media = MediaFileUpload(str(local_path), mimetype=mime, resumable=True)
+    if existing_id and not overwrite:
+        # Already there; don't duplicate
+        return "skipped"
 
-    if existing_id and overwrite:
+    media = make_media(local_path, mime)
+
+    if existing_id:
         # Overwrite existing file contents (no duplicate)
         service.files().update(
             fileId=existing_id,
             media_body=media,
             supportsAllDrives=True
-        ).execute()
+        ).execute(num_retries=DRIVE_NUM_RETRIES)
         return "updated"
 
-    if existing_id and not overwrite:
-        # Already there; don't duplicate
-        return "skipped"
-
     # Doesn't exist yet -> create it
     meta = {"name": local_path.name, "parents": [parent_id]}
-    service.files().create(
+    created = service.files().create(
         body=meta,
         media_body=media,
         fields="id",
         supportsAllDrives=True
-    ).execute()
+    ).execute(num_retries=DRIVE_NUM_RETRIES)
+    remember_child(parent_id, local_path.name, created["id"], mime)
     return "created"
 
-def upload_tree(service, local_dir: Path, drive_parent_id: str, pbar: tqdm, stats: dict):
-    for entry in sorted(local_dir.iterdir()):
-        if entry.is_dir():
-            child_id = ensure_drive_folder(service, entry.name, drive_parent_id)
-            upload_tree(service, entry, child_id, pbar, stats)
-        else:
-            overwrite = entry.suffix.lower() == ".csv"
-            result = upload_file(service, entry, drive_parent_id, overwrite=overwrite)
+def plan_uploads(service, local_dir: Path, drive_parent_id: str) -> list:
+    """
+    Find/create the Drive folders mirroring `local_dir` and return one
+    (local_path, drive_parent_id, overwrite) job per file.
+    Folders are handled here, before any upload starts, so parallel uploads
+    never race to create the same folder twice. The tree is walked one
+    depth level at a time so each level's missing folders go out as a
+    single batch request.
+    """
+    jobs = []
+    level = [(local_dir, drive_parent_id)]
+
+    while level:
+        subdirs = []  # (local_path, name, drive_parent_id)
 
+        for folder, folder_id in level:
+            # os.scandir's DirEntry carries the file type from readdir, so the
+            # is_dir() checks below don't need an extra stat per entry.
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda e: e.name)
+
+            # List this Drive folder now so upload workers only read the cache.
+            list_children(service, folder_id)
+
+            for entry in entries:
+                if entry.is_dir():
+                    subdirs.append((Path(entry.path), entry.name, folder_id))
+                else:
+                    local_path = Path(entry.path)
+                    overwrite = local_path.suffix.lower() == ".csv"
+                    jobs.append((local_path, folder_id, overwrite))
+
+        child_ids = ensure_drive_folders(
+            service, [(name, parent_id) for _, name, parent_id in subdirs]
+        )
+        level = [(path, child_id) for (path, _, _), child_id in zip(subdirs, child_ids)]
+
+    return jobs
+
+def upload_files(jobs: list, pbar: tqdm, stats: dict):
+    """Upload the (local_path, drive_parent_id, overwrite) jobs from plan_uploads."""
+    lock = threading.Lock()
+
+    def run(job):
+        local_path, parent_id, overwrite = job
+        result = upload_file(get_thread_drive_service(), local_path, parent_id, overwrite=overwrite)
+
+        with lock:
             if result == "created":
                 stats["created"] += 1
             elif result == "updated":
@@ -182,7 +383,19 @@ def upload_tree(service, local_dir: Path, drive_parent_id: str, pbar: tqdm, stat
                 stats["skipped"] += 1
 
             pbar.update(1)
-            pbar.set_postfix_str(f"{result}: {entry.name[:40]}", refresh=False)
+            pbar.set_postfix_str(f"{result}: {local_path.name[:40]}", refresh=False)
+
+    # Each upload is mostly waiting on Drive round trips, so overlap them.
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        futures = [pool.submit(run, job) for job in jobs]
+        try:
+            for fut in as_completed(futures):
+                fut.result()
+        except BaseException:
+            # Fail like the sequential version did: stop queuing more uploads.
+            for fut in futures:
+                fut.cancel()
+            raise
 
 
 def main():
@@ -226,11 +439,22 @@ def main():
     drive_day_id = ensure_drive_folder(service, date_str, DRIVE_PARENT_FOLDER_ID)
 
     # Upload everything inside the local dated folder (CSV + photos/)
-    total_files = count_files_recursive(local_day_dir)
-    print(f"[INFO] Uploading {total_files} files from: {local_day_dir}")
-
-    with tqdm(total=total_files, unit="file", desc="Uploading", dynamic_ncols=True) as pbar:
-        upload_tree(service, local_day_dir, drive_day_id, pbar, stats)
+    jobs = plan_uploads(service, local_day_dir, drive_day_id)
+    print(f"[INFO] Uploading {len(jobs)} files from: {local_day_dir}")
+
+    # tqdm draws on stderr. When the kiosk runs us that is a pipe and every
+    # redraw becomes a line in its log dialog, so redraw less often there
+    # than in a terminal.
+    mininterval = 0.1 if sys.stderr.isatty() else 1.0
+
+    with tqdm(
+        total=len(jobs),
+        unit="file",
+        desc="Uploading",
+        dynamic_ncols=True,
+        mininterval=mininterval,
+    ) as pbar:
+        upload_files(jobs, pbar, stats)
 
     print(f"Uploaded: {local_day_dir} -> Drive folder '{date_str}'")
     print("\nUpload Summary")